@@ -1,3 +1,6 @@
 """
 .. include:: ../../README.md
 """
+from openai_api_wrapper.chat_completion import ChatCompletion, Message
+
+__all__ = ["ChatCompletion", "Message"]
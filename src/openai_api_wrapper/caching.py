@@ -0,0 +1,240 @@
+"""Response caches for the OpenAI API Wrapper.
+
+Responses are cached on an exact match of the model and the full conversation
+history. Two backends are available: an in-memory least-recently-used cache
+and an on-disk cache that persists between sessions. The directory of the
+on-disk cache can be set with the OPENAI_WRAPPER_CACHE_DIR environment
+variable. Conversations are serialized with orjson when it is installed.
+
+This module also provides a `SemanticCache`, which reuses responses to user
+messages that are similar, rather than identical, to previous ones.
+"""
+import collections
+import hashlib
+import json
+import math
+import os
+import pathlib
+import shelve
+import threading
+from typing import Callable, Literal, Sequence
+
+import openai
+
+from openai_api_wrapper import constants
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+__all__ = [
+    "CacheType",
+    "DiskCache",
+    "MemoryCache",
+    "SemanticCache",
+    "cache_key",
+    "get_cache",
+    "openai_embedding",
+]
+
+CacheType = Literal["memory", "disk"]
+
+_caches: dict[str, "MemoryCache | DiskCache"] = {}
+_caches_lock = threading.Lock()
+# dbm.dumb, which shelve may fall back to, is not safe for concurrent access,
+# so all disk caches in the process share a single lock.
+_disk_lock = threading.Lock()
+
+
+def cache_key(model: str, messages: list[dict]) -> str:
+    """Computes the cache key of a conversation.
+
+    Args:
+        model: The model used for the conversation.
+        messages: The messages of the conversation, as dictionaries.
+
+    Returns:
+        str: A hexadecimal digest that uniquely identifies the conversation.
+    """
+    conversation = {"model": model, "messages": messages}
+    if orjson is not None:
+        payload = orjson.dumps(conversation, option=orjson.OPT_SORT_KEYS)
+    else:
+        # Matches the output of orjson, so that keys do not depend on whether
+        # it is installed.
+        payload = json.dumps(
+            conversation, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+    return hashlib.blake2b(payload).hexdigest()
+
+
+class MemoryCache:
+    """An in-memory least-recently-used cache of responses. Safe for use from
+    multiple threads.
+
+    Attributes:
+        maxsize: The maximum number of responses to keep.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._data: collections.OrderedDict[str, str] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached response for a key, or None if it is absent."""
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: str, value: str) -> None:
+        """Stores a response, evicting the least recently used if full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes all cached responses."""
+        with self._lock:
+            self._data.clear()
+
+
+class DiskCache:
+    """An on-disk cache of responses, backed by `shelve`. Safe for use from
+    multiple threads, but not from multiple processes.
+
+    Attributes:
+        directory: The directory in which the cache is stored.
+    """
+
+    def __init__(self, directory: pathlib.Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._path = str(self.directory / "responses")
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached response for a key, or None if it is absent."""
+        with _disk_lock, shelve.open(self._path) as database:
+            return database.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        """Stores a response."""
+        with _disk_lock, shelve.open(self._path) as database:
+            database[key] = value
+
+    def clear(self) -> None:
+        """Removes all cached responses."""
+        with _disk_lock, shelve.open(self._path) as database:
+            database.clear()
+
+
+def get_cache(cache_type: CacheType | None) -> MemoryCache | DiskCache | None:
+    """Returns the process-wide cache of the given type.
+
+    Args:
+        cache_type: The type of cache; one of "memory", "disk", or None.
+
+    Returns:
+        The cache, or None if caching is disabled.
+    """
+    if cache_type is None:
+        return None
+    with _caches_lock:
+        if cache_type not in _caches:
+            if cache_type == "memory":
+                _caches[cache_type] = MemoryCache()
+            else:
+                directory = os.environ.get(
+                    "OPENAI_WRAPPER_CACHE_DIR",
+                    pathlib.Path.home() / ".cache" / constants.LOGGER_NAME,
+                )
+                _caches[cache_type] = DiskCache(pathlib.Path(directory))
+        return _caches[cache_type]
+
+
+def openai_embedding(text: str, api_key: str) -> list[float]:
+    """Embeds a text with the OpenAI embedding API.
+
+    Args:
+        text: The text to embed.
+        api_key: Your OpenAI API key.
+
+    Returns:
+        list[float]: The embedding of the text.
+    """
+    response = openai.Embedding.create(
+        model=constants.EMBEDDING_MODEL, input=text, api_key=api_key
+    )
+    return response["data"][0]["embedding"]
+
+
+class SemanticCache:
+    """A cache of responses, looked up by the cosine similarity of the last
+    user message to previously answered ones.
+
+    Entries are grouped by a scope, typically the cache key of the preceding
+    conversation, such that responses are only reused within the same
+    context. When full, the oldest entry is evicted. Safe for use from
+    multiple threads.
+
+    Attributes:
+        embed: A function that maps a text and an API key to an embedding.
+        threshold: The minimum cosine similarity for a cache hit.
+        maxsize: The maximum number of responses to keep.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str, str], Sequence[float]] = openai_embedding,
+        threshold: float = 0.95,
+        maxsize: int = 1024,
+    ) -> None:
+        self.embed = embed
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._entries: dict[str, list[tuple[list[float], str]]] = {}
+        self._order: collections.deque[str] = collections.deque()
+        self._lock = threading.Lock()
+
+    def __deepcopy__(self, memo: dict) -> "SemanticCache":
+        """Returns the cache itself, as it is a resource shared between
+        conversations rather than data owned by one.
+        """
+        return self
+
+    def vectorize(self, text: str, api_key: str) -> list[float]:
+        """Returns the unit-normalized embedding of a text."""
+        vector = self.embed(text, api_key)
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def get(self, scope: str, vector: list[float]) -> str | None:
+        """Returns the response of the most similar entry within a scope, or
+        None if no entry reaches the similarity threshold.
+        """
+        with self._lock:
+            entries = list(self._entries.get(scope, []))
+        best_score, best_content = -1.0, None
+        for entry_vector, content in entries:
+            score = sum(a * b for a, b in zip(vector, entry_vector))
+            if score > best_score:
+                best_score, best_content = score, content
+        if best_score >= self.threshold:
+            return best_content
+        return None
+
+    def set(self, scope: str, vector: list[float], content: str) -> None:
+        """Stores a response under a scope, evicting the oldest if full."""
+        with self._lock:
+            self._entries.setdefault(scope, []).append((vector, content))
+            self._order.append(scope)
+            if len(self._order) > self.maxsize:
+                oldest_scope = self._order.popleft()
+                del self._entries[oldest_scope][0]
+                if not self._entries[oldest_scope]:
+                    del self._entries[oldest_scope]
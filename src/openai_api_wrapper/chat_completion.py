@@ -11,21 +11,42 @@ conversation history.
 
 """
 # pylint: disable=no-self-argument
+import asyncio
+import contextlib
+import dataclasses
 import logging
 import os
 import pathlib
 import re
-from typing import Literal
+from typing import Any, AsyncIterator, Iterator, Literal, Mapping, get_args
 
+import aiohttp
 import openai
 import pydantic
 
-from openai_api_wrapper import constants, logs
+from openai_api_wrapper import caching, constants, logs
+
+__all__ = [
+    "ChatCompletion",
+    "Message",
+    "Role",
+    "batch_prompt",
+    "cli_entrypoint",
+    "cli_entrypoint_async",
+    "cli_entrypoint_batch",
+    "cli_entrypoint_stream",
+    "shared_session",
+]
 
 logger = logging.getLogger(logs.LOGGER_NAME)
 
 
-@pydantic.dataclasses.dataclass
+Role = Literal["user", "assistant", "system"]
+_VALID_ROLES = frozenset(get_args(Role))
+_ROLE_SPLIT = re.compile(f"({'|'.join(get_args(Role))}):")
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
 class Message:
     """Represents a message in a conversation.
 
@@ -34,8 +55,26 @@ class Message:
         content: The content of the message.
     """
 
-    role: str
+    role: Role
     content: str
+    _dict: dict[str, str] = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """Validates the role and content of the message.
+
+        Raises:
+            ValueError: If the role is not one of "user", "assistant", or "system".
+            TypeError: If the content is not a string.
+        """
+        if self.role not in _VALID_ROLES:
+            raise ValueError(
+                f"Role {self.role} is not supported. Supported roles are: {sorted(_VALID_ROLES)}"
+            )
+        if not isinstance(self.content, str):
+            raise TypeError(
+                f"Content must be a string, not {type(self.content).__name__}."
+            )
+        object.__setattr__(self, "_dict", {"role": self.role, "content": self.content})
 
     def __str__(self):
         """Returns a string representation of the Message object.
@@ -46,25 +85,14 @@ class Message:
         """
         return f"{self.role}: {self.content}"
 
-    @pydantic.field_validator("role")
-    def role_is_valid(cls, role: str) -> str:
-        """Validates the role of the message sender.
-
-        Args:
-            role: The role of the message sender.
-
-        Raises:
-            ValueError: If the role is not one of "user", "assistant", or "system".
+    def to_dict(self) -> dict[str, str]:
+        """Returns the message as a dictionary, as expected by the OpenAI API.
+        The dictionary is built once, on construction, and reused.
 
         Returns:
-            str: The role of the message sender.
+            dict[str, str]: The role and content of the message.
         """
-        valid_roles = ("user", "assistant", "system")
-        if role in valid_roles:
-            return role
-        raise ValueError(
-            f"Role {role} is not supported. Supported roles are: {valid_roles}"
-        )
+        return self._dict
 
 
 class ChatCompletion(pydantic.BaseModel, extra="forbid"):
@@ -75,6 +103,11 @@ class ChatCompletion(pydantic.BaseModel, extra="forbid"):
         model: The model to use.
         system_prompt: The prompt to use for the system.
         messages: The messages to pre-load the API with.
+        cache: The response cache to use; one of "memory", "disk", or None.
+            Defaults to the OPENAI_WRAPPER_CACHE environment variable.
+        semantic_cache: A cache that reuses responses to similar user messages.
+        max_history: The maximum number of messages to keep. When exceeded,
+            the oldest non-system messages are dropped. None keeps all.
     """
 
     api_key: pydantic.SecretStr = pydantic.Field(
@@ -86,33 +119,106 @@ class ChatCompletion(pydantic.BaseModel, extra="forbid"):
     system_prompt: str = pydantic.Field(
         "", description="The prompt to use for the system.", frozen=True
     )
-    messages: list[Message] = pydantic.Field(
+    messages: list[pydantic.InstanceOf[Message]] = pydantic.Field(
         [],
         description="The messages to pre-load the API with.",
     )
+    cache: caching.CacheType | None = pydantic.Field(
+        os.environ.get("OPENAI_WRAPPER_CACHE") or None,  # type: ignore[arg-type]
+        description="The response cache to use.",
+        frozen=True,
+        validate_default=True,
+    )
+    max_history: int | None = pydantic.Field(
+        None,
+        description="The maximum number of messages to keep.",
+        frozen=True,
+        ge=1,
+    )
+    _api_key_plain: str = pydantic.PrivateAttr()
+    _semantic_cache: caching.SemanticCache | None = pydantic.PrivateAttr(None)
+
+    def __init__(
+        self, semantic_cache: caching.SemanticCache | None = None, **data: Any
+    ) -> None:
+        """Constructs the conversation.
+
+        The semantic cache is a runtime dependency rather than conversation
+        data, so it is kept out of the model's fields, schema and dumps.
+
+        Args:
+            semantic_cache: A cache that reuses responses to similar user
+                messages.
+            **data: The fields of the conversation.
+        """
+        super().__init__(**data)
+        self._semantic_cache = semantic_cache
+
+    @property
+    def semantic_cache(self) -> caching.SemanticCache | None:
+        """The cache that reuses responses to similar user messages."""
+        return self._semantic_cache
+
+    @pydantic.field_validator("messages", mode="before")
+    def messages_from_mappings(cls, messages: Any) -> Any:
+        """Converts messages provided as mappings, e.g. from `model_dump`, to
+        Message objects.
+
+        Args:
+            messages: The messages to pre-load the API with.
+
+        Raises:
+            ValueError: If a mapping does not describe a valid message.
+
+        Returns:
+            The messages, with mappings replaced by Message objects.
+        """
+        if not isinstance(messages, list):
+            return messages
+        parsed_messages = []
+        for message in messages:
+            if isinstance(message, Mapping):
+                try:
+                    message = Message(**message)
+                except TypeError as exc:
+                    raise ValueError(str(exc)) from exc
+            parsed_messages.append(message)
+        return parsed_messages
 
     @pydantic.field_validator("model")
     def model_is_supported(cls, model: str) -> str:
         if model in constants.CHAT_MODELS:
             return model
         raise ValueError(
-            f"Model {model} is not supported. Supported models are: {constants.CHAT_MODELS}"
+            f"Model {model} is not supported. {constants.SUPPORTED_MODELS_MESSAGE}"
         )
 
     def model_post_init(self, __context) -> None:
         """Initializes the GPT object after it has been constructed.
 
         Raises:
-            ValueError: If neither messages nor system_prompt are provided, or
-                if both are provided.
+            ValueError: If neither messages nor system_prompt are provided, if
+                both are provided, or if max_history does not leave room for a
+                message besides the system messages.
         """
-        logger.debug("Initializing GPT object.")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Initializing GPT object.")
         if not self.messages and not self.system_prompt:
             raise ValueError("You must provide either messages or a system_prompt.")
         if self.messages and self.system_prompt:
             raise ValueError("You cannot provide both messages and a system_prompt.")
         if self.system_prompt:
             self.messages = [Message(role="system", content=self.system_prompt)]
+        if self.max_history is not None:
+            n_system = sum(message.role == "system" for message in self.messages)
+            if self.max_history <= n_system:
+                raise ValueError(
+                    f"max_history must be larger than the number of system messages ({n_system})."
+                )
+        self._trim_history()
+        self._api_key_plain = (
+            self.api_key.get_secret_value()  # pylint: disable=no-member
+        )
 
     def add_message(self, role: Literal["user", "assistant"], content: str):
         """Adds a new message to the conversation.
@@ -122,8 +228,27 @@ class ChatCompletion(pydantic.BaseModel, extra="forbid"):
                 "assistant".
             content: The content of the message.
         """
-        logger.debug("Adding message: %s: %s", role, content)
-        self.messages.append(Message(role=role, content=content))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Adding message: %s: %s", role, content)
+        message = Message(role=role, content=content)
+        self.messages.append(message)
+        self._trim_history()
+
+    def _trim_history(self) -> None:
+        """Drops the oldest non-system messages until the conversation is no
+        longer than `max_history`. The last message is never dropped.
+        """
+        if self.max_history is None or len(self.messages) <= self.max_history:
+            return
+        index = 0
+        while len(self.messages) > self.max_history:
+            while (
+                index < len(self.messages) - 1 and self.messages[index].role == "system"
+            ):
+                index += 1
+            if index >= len(self.messages) - 1:
+                return
+            del self.messages[index]
 
     def prompt(self) -> str:
         """Sends the conversation history to the OpenAI API and returns the
@@ -132,23 +257,146 @@ class ChatCompletion(pydantic.BaseModel, extra="forbid"):
         Returns:
             str: The response from the OpenAI API.
         """
-        logger.debug("Prompting API.")
-        response = openai.ChatCompletion.create(
-            model=self.model,
-            messages=self._messages_as_dicts(),
-            api_key=self.api_key.get_secret_value(),  # pylint: disable=no-member
-        )
-        self.add_message(
-            role="assistant", content=response["choices"][0]["message"]["content"]
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prompting API.")
+        content, key, vector = self._lookup_cache()
+        if content is None:
+            response = openai.ChatCompletion.create(
+                model=self.model,
+                messages=self._messages_as_dicts(),
+                api_key=self._api_key_plain,
+            )
+            content = response["choices"][0]["message"]["content"]
+            self._store_cache(key, vector, content)
+        self.add_message(role="assistant", content=content)
         return self.messages[-1].content
 
-    def _messages_as_dicts(self) -> list[dict]:
+    def stream_prompt(self) -> Iterator[str]:
+        """Sends the conversation history to the OpenAI API and yields the
+        response as it is generated. The full response is added to the
+        conversation once it has been consumed.
+
+        Yields:
+            str: Consecutive chunks of the response from the OpenAI API.
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prompting API with streaming.")
+        content, key, vector = self._lookup_cache()
+        if content is None:
+            response = openai.ChatCompletion.create(
+                model=self.model,
+                messages=self._messages_as_dicts(),
+                api_key=self._api_key_plain,
+                stream=True,
+            )
+            chunks = []
+            for event in response:
+                if not event["choices"]:
+                    continue
+                delta = event["choices"][0]["delta"].get("content")
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+            content = "".join(chunks)
+            self._store_cache(key, vector, content)
+        else:
+            yield content
+        self.add_message(role="assistant", content=content)
+
+    async def aprompt(self) -> str:
+        """Asynchronously sends the conversation history to the OpenAI API and
+        returns the response. This allows multiple conversations to await the
+        API concurrently on a single event loop. Run it within
+        `shared_session` to reuse connections between calls.
+
+        Returns:
+            str: The response from the OpenAI API.
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prompting API asynchronously.")
+        # Cache access may block on disk or embedding requests, so it is kept
+        # off the event loop.
+        uses_cache = self.cache is not None or self.semantic_cache is not None
+        if uses_cache:
+            content, key, vector = await asyncio.to_thread(self._lookup_cache)
+        else:
+            content, key, vector = None, None, None
+        if content is None:
+            response = await openai.ChatCompletion.acreate(
+                model=self.model,
+                messages=self._messages_as_dicts(),
+                api_key=self._api_key_plain,
+            )
+            content = response["choices"][0]["message"]["content"]
+            if uses_cache:
+                await asyncio.to_thread(self._store_cache, key, vector, content)
+        self.add_message(role="assistant", content=content)
+        return self.messages[-1].content
+
+    def _lookup_cache(self) -> tuple[str | None, str | None, list[float] | None]:
+        """Looks up the conversation in the exact-match and semantic caches.
+
+        Returns:
+            The cached response, or None on a miss, followed by the cache key
+            of the conversation and the embedding of the last user message.
+            The latter two are needed to store the response on a miss.
+        """
+        response_cache = caching.get_cache(self.cache)
+        if response_cache is None and self.semantic_cache is None:
+            return None, None, None
+
+        key = caching.cache_key(self.model, self._messages_as_dicts())
+        if response_cache and (content := response_cache.get(key)) is not None:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Exact-match cache hit.")
+            return content, key, None
+
+        if self.semantic_cache is None or self.messages[-1].role != "user":
+            return None, key, None
+        vector = self.semantic_cache.vectorize(
+            self.messages[-1].content,
+            self._api_key_plain,
+        )
+        content = self.semantic_cache.get(self._semantic_scope(), vector)
+        if content is not None:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Semantic cache hit.")
+            return content, key, None
+        return None, key, vector
+
+    def _store_cache(
+        self, key: str | None, vector: list[float] | None, content: str
+    ) -> None:
+        """Stores a response in the caches it was missing from.
+
+        Args:
+            key: The cache key of the conversation.
+            vector: The embedding of the last user message.
+            content: The response to store.
+        """
+        response_cache = caching.get_cache(self.cache)
+        if response_cache and key:
+            response_cache.set(key, content)
+        if self.semantic_cache and vector is not None:
+            self.semantic_cache.set(self._semantic_scope(), vector, content)
+
+    def _semantic_scope(self) -> str:
+        """Returns the scope of the semantic cache, i.e. the cache key of all
+        messages preceding the last user message.
+        """
+        return caching.cache_key(self.model, self._messages_as_dicts()[:-1])
+
+    def _messages_as_dicts(self) -> list[dict[str, str]]:
         """Returns a list of dictionaries representing the messages in the
-        conversation. Each dictionary contains the message's attributes as key-value pairs.
+        conversation. Each dictionary contains only the role and content of
+        the message, without any private attributes.
+
+        The dictionaries are memoized on each `Message`, so no new
+        dictionaries are built per call.
         """
-        logger.debug("Converting messages to dictionaries.")
-        return [message.__dict__ for message in self.messages]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Converting messages to dictionaries.")
+        return [message.to_dict() for message in self.messages]
 
 
 def cli_entrypoint(
@@ -169,38 +417,237 @@ def cli_entrypoint(
         Each subsequent message must be a string starting with "user:" or "assistant:".
         messages_file: A file containing messages to add to the conversation.
     """
+    chat_completion = _build_chat_completion(api_key, model, messages, messages_file)
+    logger.info("Sending messages to API.")
+    return chat_completion.prompt()
+
+
+def cli_entrypoint_stream(
+    api_key: str | None = None,
+    model: str | None = None,
+    messages: list[str] | None = None,
+    messages_file: pathlib.Path | None = None,
+) -> Iterator[str]:
+    """Streaming variant of `cli_entrypoint`, which yields the response as it
+    is generated.
+
+    Args:
+        api_key: Your OpenAI API key. If not provided, the OPENAI_API_KEY
+            environment variable will be used.
+        model: The model to use for the API call. Must be one of the models
+            listed in `SUPPORTED_MODELS`.
+        messages: A list of messages to add to the conversation.
+        messages_file: A file containing messages to add to the conversation.
+    """
+    chat_completion = _build_chat_completion(api_key, model, messages, messages_file)
+    logger.info("Sending messages to API.")
+    return chat_completion.stream_prompt()
+
+
+async def cli_entrypoint_async(
+    api_key: str | None = None,
+    model: str | None = None,
+    messages: list[str] | None = None,
+    messages_file: pathlib.Path | None = None,
+) -> str:
+    """Asynchronous variant of `cli_entrypoint`.
+
+    A single aiohttp session is shared for the duration of the call, so that
+    the connection is reused rather than re-established per request.
+
+    Args:
+        api_key: Your OpenAI API key. If not provided, the OPENAI_API_KEY
+            environment variable will be used.
+        model: The model to use for the API call. Must be one of the models
+            listed in `SUPPORTED_MODELS`.
+        messages: A list of messages to add to the conversation.
+        messages_file: A file containing messages to add to the conversation.
+    """
+    chat_completion = _build_chat_completion(api_key, model, messages, messages_file)
+    logger.info("Sending messages to API.")
+    async with shared_session():
+        return await chat_completion.aprompt()
+
+
+def cli_entrypoint_batch(
+    api_key: str | None = None,
+    model: str | None = None,
+    messages: list[str] | None = None,
+    messages_file: pathlib.Path | None = None,
+    concurrency: int = 32,
+) -> list[str]:
+    """Runs the CLI for the OpenAI API Wrapper in batch mode.
+
+    Every user message is sent as an independent conversation that shares
+    the system messages. The conversations are prompted concurrently.
+
+    Args:
+        api_key: Your OpenAI API key. If not provided, the OPENAI_API_KEY
+            environment variable will be used.
+        model: The model to use for the API call. Must be one of the models
+            listed in `SUPPORTED_MODELS`.
+        messages: A list of messages to add to the conversation.
+        messages_file: A file containing messages to add to the conversation.
+        concurrency: The maximum number of requests in flight at once.
+
+    Returns:
+        list[str]: The responses, in the order of the user messages.
+
+    Raises:
+        ValueError: If an assistant message is provided, or if there are no
+            user messages.
+    """
+    parsed_messages = _parse_messages(messages, messages_file)
+    if any(message.role == "assistant" for message in parsed_messages):
+        raise ValueError("Batch mode does not support assistant messages.")
+    system_messages = [
+        message for message in parsed_messages if message.role == "system"
+    ]
+    prompts = [message for message in parsed_messages if message.role == "user"]
+    if not prompts:
+        raise ValueError("Batch mode requires at least one user message.")
+
+    logger.info("Initializing %s ChatCompletion objects.", len(prompts))
+    args: dict = {"model": model}
+    if api_key:
+        args["api_key"] = api_key
+    chats = [
+        ChatCompletion(messages=[*system_messages, message], **args)
+        for message in prompts
+    ]
+    logger.info("Sending messages to API.")
+    return asyncio.run(batch_prompt(chats, max_concurrency=concurrency))
+
+
+async def batch_prompt(
+    chats: list[ChatCompletion], max_concurrency: int = 32
+) -> list[str]:
+    """Prompts multiple conversations concurrently.
+
+    Args:
+        chats: The conversations to prompt.
+        max_concurrency: The maximum number of requests in flight at once.
+
+    If any conversation fails, the others are cancelled before the shared
+    session is closed, and the first error is raised.
+
+    Returns:
+        list[str]: The responses, in the same order as `chats`.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _prompt(chat: ChatCompletion) -> str:
+        async with semaphore:
+            return await chat.aprompt()
+
+    async with shared_session(max_connections=max_concurrency):
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                tasks = [task_group.create_task(_prompt(chat)) for chat in chats]
+        except ExceptionGroup as exc_group:
+            raise exc_group.exceptions[0] from exc_group
+    return [task.result() for task in tasks]
+
+
+@contextlib.asynccontextmanager
+async def shared_session(
+    max_connections: int = constants.MAX_CONNECTIONS,
+) -> AsyncIterator[aiohttp.ClientSession]:
+    """Shares a single aiohttp session across all asynchronous OpenAI requests
+    made within the context, such that connections are pooled and reused
+    rather than opened per request. If a session is already shared, it is
+    reused as is.
+
+    Args:
+        max_connections: The maximum number of simultaneous connections.
+
+    Yields:
+        aiohttp.ClientSession: The shared session.
+    """
+    existing_session = openai.aiosession.get()
+    if existing_session is not None:
+        yield existing_session
+        return
+
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        token = openai.aiosession.set(session)
+        try:
+            yield session
+        finally:
+            openai.aiosession.reset(token)
+
+
+def _build_chat_completion(
+    api_key: str | None,
+    model: str | None,
+    messages: list[str] | None,
+    messages_file: pathlib.Path | None,
+) -> ChatCompletion:
+    """Parses the CLI messages and constructs a ChatCompletion object.
+
+    Args:
+        api_key: Your OpenAI API key.
+        model: The model to use for the API call.
+        messages: A list of messages to add to the conversation.
+        messages_file: A file containing messages to add to the conversation.
+
+    Returns:
+        ChatCompletion: The conversation, ready to be prompted.
+    """
+    parsed_messages = _parse_messages(messages, messages_file)
+    logger.info("Initializing ChatCompletion object.")
+    args: dict[str, Any] = {"model": model, "messages": parsed_messages}
+    if api_key:
+        args["api_key"] = api_key
+    return ChatCompletion(**args)
+
+
+def _parse_messages(
+    messages: list[str] | None,
+    messages_file: pathlib.Path | None,
+) -> list[Message]:
+    """Parses messages provided through the CLI.
+
+    Args:
+        messages: A list of messages, each starting with the role followed by
+            a colon.
+        messages_file: A file containing messages, each starting with
+            'user:', 'assistant:', or 'system:'.
+
+    Returns:
+        list[Message]: The parsed messages.
+    """
     if messages and messages_file:
         raise ValueError("You cannot provide both messages and a messages_file.")
     if not messages and not messages_file:
         raise ValueError("You must provide either messages or a messages_file.")
 
     if messages_file:
-        messages_file_full = messages_file.absolute().resolve()
-        with open(messages_file_full, "r", encoding="utf-8") as file_buffer:
-            lines = file_buffer.readlines()
-        text = "\n".join(lines)
-        split_text = re.split(r"(user:|assistant:|system:)", text)
-        if len(split_text) < 3:
+        text = messages_file.absolute().resolve().read_text(encoding="utf-8")
+        matches = list(_ROLE_SPLIT.finditer(text))
+        if not matches:
             raise ValueError(
                 "Messages file must contain at least one message. Each message must start with 'user:', 'assistant:', or 'system:'."
             )
-        parsed_messages = [
-            Message(role=role[:-1], content=content)
-            for role, content in zip(split_text[1::2], split_text[2::2])
-        ]
-    else:
-        parsed_messages = [
+        ends = [match.start() for match in matches[1:]] + [len(text)]
+        return [
             Message(
-                role=message.split(":")[0].strip(),
-                content=message.split(":")[1].strip(),
+                role=match.group(1),  # type: ignore[arg-type]
+                content=text[match.end() : end].strip(),
             )
-            for message in messages  # type: ignore[union-attr]
+            for match, end in zip(matches, ends)
         ]
-
-    logger.info("Initializing ChatCompletion object.")
-    args = {"model": model, "messages": parsed_messages}
-    if api_key:
-        args["api_key"] = api_key
-    chat_completion = ChatCompletion(**args)
-    logger.info("Sending messages to API.")
-    return chat_completion.prompt()
+    parsed_messages = []
+    for message in messages:  # type: ignore[union-attr]
+        role, separator, content = message.partition(":")
+        if not separator:
+            raise ValueError(
+                f"Message '{message}' must start with 'user:', 'assistant:', or 'system:'."
+            )
+        parsed_messages.append(
+            Message(role=role.strip(), content=content.strip())  # type: ignore[arg-type]
+        )
+    return parsed_messages
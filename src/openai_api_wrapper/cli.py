@@ -7,7 +7,27 @@ logger = logging.getLogger(logs.LOGGER_NAME)
 
 def main() -> None:
     args = parser.get_parser().parse_args()
-    if args.model in constants.CHAT_MODELS:
+    if args.model in constants.CHAT_MODELS and args.batch:
+        responses = chat_completion.cli_entrypoint_batch(
+            api_key=args.api_key,
+            model=args.model,
+            messages=args.message,
+            messages_file=args.messages_file,
+            concurrency=args.concurrency,
+        )
+        response = "\n\n".join(responses)
+    elif args.model in constants.CHAT_MODELS and args.stream:
+        chunks = chat_completion.cli_entrypoint_stream(
+            api_key=args.api_key,
+            model=args.model,
+            messages=args.message,
+            messages_file=args.messages_file,
+        )
+        for chunk in chunks:
+            print(chunk, end="", flush=True)
+        print()
+        return
+    elif args.model in constants.CHAT_MODELS:
         response = chat_completion.cli_entrypoint(
             api_key=args.api_key,
             model=args.model,
@@ -16,7 +36,7 @@ def main() -> None:
         )
     else:
         raise NotImplementedError(
-            f"Model {args.model} is not supported. Supported models are: {constants.SUPPORTED_MODELS}"
+            f"Model {args.model} is not supported. {constants.SUPPORTED_MODELS_MESSAGE}"
         )
     print(response)
 
@@ -3,5 +3,11 @@ import pathlib
 
 LOGGER_NAME = pathlib.Path(__file__).parent.name
 
-CHAT_MODELS = {"gpt-4", "gpt-4-32k", "gpt-3.5-turbo", "gpt-3.5-turbo-16k"}
+CHAT_MODELS: frozenset[str] = frozenset(
+    {"gpt-4", "gpt-4-32k", "gpt-3.5-turbo", "gpt-3.5-turbo-16k"}
+)
 SUPPORTED_MODELS = CHAT_MODELS
+SUPPORTED_MODELS_MESSAGE = f"Supported models are: {sorted(SUPPORTED_MODELS)}"
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+MAX_CONNECTIONS = 100
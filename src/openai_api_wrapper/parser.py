@@ -11,6 +11,27 @@ LOGGER_NAME = logs.LOGGER_NAME
 logger = logging.getLogger(LOGGER_NAME)
 
 
+def _positive_int(value: str) -> int:
+    """Parses a strictly positive integer.
+
+    Args:
+        value: The value provided on the command line.
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not a positive integer.
+
+    Returns:
+        int: The parsed integer.
+    """
+    try:
+        number = int(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"{value} is not an integer.") from exc
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer.")
+    return number
+
+
 def get_parser() -> argparse.ArgumentParser:
     """Returns an ArgumentParser object for the CLI.
 
@@ -38,7 +59,7 @@ def get_parser() -> argparse.ArgumentParser:
         "model",
         type=str,
         help="The model to use for the API call",
-        choices=constants.SUPPORTED_MODELS,
+        choices=sorted(constants.SUPPORTED_MODELS),
     )
     chat_completion_group.add_argument(
         "--message",
@@ -51,6 +72,22 @@ def get_parser() -> argparse.ArgumentParser:
         type=pathlib.Path,
         help="A file containing messages to add to the conversation. Each message must start with 'user:' or 'assistant:'",
     )
+    chat_completion_group.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the response as it is generated. Ignored in batch mode.",
+    )
+    chat_completion_group.add_argument(
+        "--batch",
+        action="store_true",
+        help="Send each user message as an independent conversation that shares the system messages. Conversations are sent concurrently. Assistant messages are not allowed.",
+    )
+    chat_completion_group.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        help="The maximum number of concurrent requests in batch mode.",
+        default=32,
+    )
     optional_group.add_argument(
         "--api-key",
         type=str,
@@ -0,0 +1,88 @@
+import concurrent.futures
+import pathlib
+
+from openai_api_wrapper import caching
+
+
+def test_cache_key_is_deterministic() -> None:
+    """Tests that equal conversations share a key and differing ones do not."""
+    messages = [{"role": "user", "content": "Hi!"}]
+
+    assert caching.cache_key("gpt-4", messages) == caching.cache_key("gpt-4", messages)
+    assert caching.cache_key("gpt-4", messages) != caching.cache_key(
+        "gpt-3.5-turbo", messages
+    )
+
+
+def test_memory_cache_evicts_least_recently_used() -> None:
+    """Tests that the memory cache evicts the least recently used entry."""
+    memory_cache = caching.MemoryCache(maxsize=2)
+    memory_cache.set("a", "1")
+    memory_cache.set("b", "2")
+    memory_cache.get("a")
+
+    memory_cache.set("c", "3")
+
+    assert memory_cache.get("a") == "1"
+    assert memory_cache.get("b") is None
+    assert memory_cache.get("c") == "3"
+
+
+def test_disk_cache_round_trip(tmp_path: pathlib.Path) -> None:
+    """Tests that the disk cache persists responses between instances."""
+    caching.DiskCache(tmp_path).set("a", "1")
+
+    assert caching.DiskCache(tmp_path).get("a") == "1"
+    assert caching.DiskCache(tmp_path).get("b") is None
+
+
+def test_semantic_cache_threshold() -> None:
+    """Tests that the semantic cache only returns sufficiently similar entries."""
+    vectors = {"hi": [1.0, 0.0], "hello": [0.99, 0.1], "bye": [0.0, 1.0]}
+    semantic_cache = caching.SemanticCache(
+        embed=lambda text, _: vectors[text], threshold=0.95
+    )
+    semantic_cache.set("scope", semantic_cache.vectorize("hi", "123"), "Hi!")
+
+    assert (
+        semantic_cache.get("scope", semantic_cache.vectorize("hello", "123")) == "Hi!"
+    )
+    assert semantic_cache.get("scope", semantic_cache.vectorize("bye", "123")) is None
+    assert semantic_cache.get("other", semantic_cache.vectorize("hi", "123")) is None
+
+
+def test_cache_key_without_orjson(mocker) -> None:
+    """Tests that the cache key does not depend on orjson being installed."""
+    messages = [{"role": "user", "content": "Héllo, {wörld}!"}]
+    expected = caching.cache_key("gpt-4", messages)
+    mocker.patch.object(caching, "orjson", None)
+
+    actual = caching.cache_key("gpt-4", messages)
+
+    assert actual == expected
+
+
+def test_semantic_cache_evicts_oldest() -> None:
+    """Tests that the semantic cache is bounded by maxsize."""
+    semantic_cache = caching.SemanticCache(embed=lambda text, _: [1.0], maxsize=2)
+    vector = semantic_cache.vectorize("hi", "123")
+    for scope in ("a", "b", "c"):
+        semantic_cache.set(scope, vector, scope)
+
+    assert semantic_cache.get("a", vector) is None
+    assert semantic_cache.get("b", vector) == "b"
+    assert semantic_cache.get("c", vector) == "c"
+
+
+def test_disk_cache_concurrent_access(tmp_path: pathlib.Path) -> None:
+    """Tests that the disk cache can be used from multiple threads."""
+    disk_cache = caching.DiskCache(tmp_path)
+
+    def _round_trip(index: int) -> str | None:
+        disk_cache.set(str(index), str(index))
+        return disk_cache.get(str(index))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(_round_trip, range(64)))
+
+    assert results == [str(index) for index in range(64)]
@@ -0,0 +1,96 @@
+import sys
+
+import pytest
+
+from openai_api_wrapper import cli
+
+
+def _response(content: str) -> dict:
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+def test_main_batch(mocker, capsys) -> None:
+    """Tests that batch mode sends each user message as its own conversation."""
+
+    async def _acreate(**kwargs) -> dict:
+        return _response(f"re: {kwargs['messages'][-1]['content']}")
+
+    acreate = mocker.patch("openai.ChatCompletion.acreate", side_effect=_acreate)
+    mocker.patch.object(
+        sys,
+        "argv",
+        [
+            "openai_api",
+            "gpt-4",
+            "--message",
+            "system: Be brief.",
+            "--message",
+            "user: a",
+            "--message",
+            "user: b",
+            "--batch",
+            "--api-key",
+            "123",
+        ],
+    )
+
+    cli.main()
+
+    assert capsys.readouterr().out == "re: a\n\nre: b\n"
+    assert [call.kwargs["messages"] for call in acreate.call_args_list] == [
+        [
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": content},
+        ]
+        for content in ("a", "b")
+    ]
+
+
+def test_main_batch_rejects_assistant_messages(mocker) -> None:
+    """Tests that batch mode raises on assistant messages."""
+    mocker.patch.object(
+        sys,
+        "argv",
+        [
+            "openai_api",
+            "gpt-4",
+            "--message",
+            "user: a",
+            "--message",
+            "assistant: b",
+            "--batch",
+            "--api-key",
+            "123",
+        ],
+    )
+
+    with pytest.raises(ValueError):
+        cli.main()
+
+
+@pytest.mark.parametrize("concurrency", ["0", "-1", "a"])
+def test_main_batch_rejects_bad_concurrency(mocker, concurrency: str) -> None:
+    """Tests that the concurrency must be a positive integer."""
+    mocker.patch.object(
+        sys,
+        "argv",
+        ["openai_api", "gpt-4", "--message", "user: a", "--concurrency", concurrency],
+    )
+
+    with pytest.raises(SystemExit):
+        cli.main()
+
+
+def test_main_stream(mocker, capsys) -> None:
+    """Tests that streamed chunks are printed as they arrive."""
+    events = [{"choices": [{"delta": {"content": chunk}}]} for chunk in ("Hel", "lo")]
+    mocker.patch("openai.ChatCompletion.create", return_value=iter(events))
+    mocker.patch.object(
+        sys,
+        "argv",
+        ["openai_api", "gpt-4", "--message", "user: a", "--stream", "--api-key", "123"],
+    )
+
+    cli.main()
+
+    assert capsys.readouterr().out == "Hello\n"
@@ -1,10 +1,13 @@
 # pylint: disable=redefined-outer-name
+import asyncio
+import pathlib
 from typing import Any
 
+import openai
 import pydantic
 import pytest
 
-from openai_api_wrapper import chat_completion
+from openai_api_wrapper import caching, chat_completion
 
 
 @pytest.fixture
@@ -40,7 +43,7 @@ def test_message_success(role: str) -> None:
 
 def test_message_bad_role() -> None:
     """Tests that an error is raised on a bad role."""
-    with pytest.raises(pydantic.ValidationError):
+    with pytest.raises(ValueError):
         chat_completion.Message(role="bad", content="Hello there!")  # type: ignore[arg-type]
 
 
@@ -97,3 +100,350 @@ def test_chat_completion_prompt(
     actual = chat.prompt()
 
     assert actual == expected
+
+
+def test_chat_completion_aprompt(
+    mocker, response: dict[str, str | int | list[dict[str, str | int]]]
+) -> None:
+    """Tests that a prompt can be run asynchronously."""
+    mocker.patch("openai.ChatCompletion.acreate", return_value=response)
+    chat = chat_completion.ChatCompletion(
+        api_key="123",
+        model="gpt-4",
+        system_prompt="Hello there!",
+    )
+    chat.add_message(role="user", content="Hi!")
+    expected = response["choices"][0]["message"]["content"]  # type: ignore[index]
+
+    actual = asyncio.run(chat.aprompt())
+
+    assert actual == expected
+    assert chat.messages[-1].role == "assistant"
+
+
+def test_batch_prompt(
+    mocker, response: dict[str, str | int | list[dict[str, str | int]]]
+) -> None:
+    """Tests that multiple conversations can be prompted concurrently."""
+    mocker.patch("openai.ChatCompletion.acreate", return_value=response)
+    chats = [
+        chat_completion.ChatCompletion(
+            api_key="123",
+            model="gpt-4",
+            system_prompt="Hello there!",
+        )
+        for _ in range(3)
+    ]
+    expected = response["choices"][0]["message"]["content"]  # type: ignore[index]
+
+    actual = asyncio.run(chat_completion.batch_prompt(chats, max_concurrency=2))
+
+    assert actual == [expected] * 3
+    assert all(chat.messages[-1].content == expected for chat in chats)
+
+
+def test_chat_completion_prompt_cache(
+    mocker, response: dict[str, str | int | list[dict[str, str | int]]]
+) -> None:
+    """Tests that a cached conversation does not call the API again."""
+    create = mocker.patch("openai.ChatCompletion.create", return_value=response)
+    caching.get_cache("memory").clear()  # type: ignore[union-attr]
+    chats = [
+        chat_completion.ChatCompletion(
+            api_key="123",
+            model="gpt-4",
+            system_prompt="Hello there!",
+            cache="memory",
+        )
+        for _ in range(2)
+    ]
+
+    responses = [chat.prompt() for chat in chats]
+
+    assert create.call_count == 1
+    assert responses[0] == responses[1]
+
+
+def test_chat_completion_prompt_semantic_cache(
+    mocker, response: dict[str, str | int | list[dict[str, str | int]]]
+) -> None:
+    """Tests that a similar user message reuses the cached response."""
+    create = mocker.patch("openai.ChatCompletion.create", return_value=response)
+    vectors = {"Hi!": [1.0, 0.0], "Hi there!": [0.99, 0.1]}
+    semantic_cache = caching.SemanticCache(embed=lambda text, _: vectors[text])
+    responses = []
+    for content in vectors:
+        chat = chat_completion.ChatCompletion(
+            api_key="123",
+            model="gpt-4",
+            system_prompt="Hello there!",
+            semantic_cache=semantic_cache,
+        )
+        chat.add_message(role="user", content=content)
+        responses.append(chat.prompt())
+
+    assert create.call_count == 1
+    assert responses[0] == responses[1]
+
+
+def test_chat_completion_messages_as_dicts() -> None:
+    """Tests that the message dictionaries follow the conversation."""
+    chat = chat_completion.ChatCompletion(
+        api_key="123", model="gpt-4", system_prompt="Hello there!"
+    )
+    chat.add_message(role="user", content="Hi!")
+    expected = [
+        {"role": "system", "content": "Hello there!"},
+        {"role": "user", "content": "Hi!"},
+    ]
+
+    assert chat._messages_as_dicts() == expected  # pylint: disable=protected-access
+
+
+def test_parse_messages_file(tmp_path: pathlib.Path) -> None:
+    """Tests that a messages file is split into messages by role."""
+    messages_file = tmp_path / "messages.txt"
+    messages_file.write_text("system: Be brief.\nuser: Hi!\nHow are you?\n")
+    expected = [
+        chat_completion.Message(role="system", content="Be brief."),
+        chat_completion.Message(role="user", content="Hi!\nHow are you?"),
+    ]
+
+    actual = chat_completion._parse_messages(  # pylint: disable=protected-access
+        messages=None, messages_file=messages_file
+    )
+
+    assert actual == expected
+
+
+def test_parse_messages_keeps_colons_in_content() -> None:
+    """Tests that only the first colon separates the role from the content."""
+    expected = [chat_completion.Message(role="user", content="Time: 12:00")]
+
+    actual = chat_completion._parse_messages(  # pylint: disable=protected-access
+        messages=["user: Time: 12:00"], messages_file=None
+    )
+
+    assert actual == expected
+
+
+def test_chat_completion_prompt_api_key(
+    mocker, response: dict[str, str | int | list[dict[str, str | int]]]
+) -> None:
+    """Tests that the plaintext API key is passed to the API."""
+    create = mocker.patch("openai.ChatCompletion.create", return_value=response)
+    chat = chat_completion.ChatCompletion(
+        api_key="123",
+        model="gpt-4",
+        system_prompt="Hello there!",
+    )
+
+    chat.prompt()
+
+    assert create.call_args.kwargs["api_key"] == "123"
+    assert "123" not in repr(chat)
+
+
+def test_shared_session_is_reused() -> None:
+    """Tests that nested shared sessions reuse the outer session."""
+
+    async def _sessions() -> tuple:
+        async with chat_completion.shared_session() as outer:
+            async with chat_completion.shared_session() as inner:
+                return outer, inner, openai.aiosession.get()
+
+    outer, inner, active = asyncio.run(_sessions())
+
+    assert outer is inner is active
+    assert openai.aiosession.get() is None
+
+
+def test_chat_completion_max_history() -> None:
+    """Tests that the oldest non-system messages are dropped first."""
+    chat = chat_completion.ChatCompletion(
+        api_key="123", model="gpt-4", system_prompt="Hello there!", max_history=3
+    )
+    for content in ("1", "2", "3"):
+        chat.add_message(role="user", content=content)
+    expected = [
+        chat_completion.Message(role="system", content="Hello there!"),
+        chat_completion.Message(role="user", content="2"),
+        chat_completion.Message(role="user", content="3"),
+    ]
+
+    assert chat.messages == expected
+    assert chat._messages_as_dicts() == [  # pylint: disable=protected-access
+        message.to_dict() for message in expected
+    ]
+
+
+def test_chat_completion_stream_prompt(mocker) -> None:
+    """Tests that a streamed response is yielded and added to the conversation."""
+    events = [
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": "Hello"}}]},
+        {"choices": [{"delta": {"content": " there!"}}]},
+        {"choices": [{"delta": {}}]},
+    ]
+    mocker.patch("openai.ChatCompletion.create", return_value=iter(events))
+    chat = chat_completion.ChatCompletion(
+        api_key="123",
+        model="gpt-4",
+        system_prompt="Hello there!",
+    )
+
+    chunks = list(chat.stream_prompt())
+
+    assert chunks == ["Hello", " there!"]
+    assert chat.messages[-1] == chat_completion.Message(
+        role="assistant", content="Hello there!"
+    )
+
+
+def test_message_to_dict() -> None:
+    """Tests that a message dictionary holds only the role and content."""
+    message = chat_completion.Message(role="user", content="Hi!")
+
+    assert message.to_dict() == {"role": "user", "content": "Hi!"}
+    assert message.to_dict() is message.to_dict()
+
+
+def test_chat_completion_messages_as_dicts_after_replacement() -> None:
+    """Tests that replacing a message in place updates the payload."""
+    chat = chat_completion.ChatCompletion(
+        api_key="123", model="gpt-4", system_prompt="Hello there!"
+    )
+    chat.add_message(role="user", content="first")
+
+    chat.messages[-1] = chat_completion.Message(role="user", content="REPLACED")
+
+    assert chat._messages_as_dicts()[-1] == {  # pylint: disable=protected-access
+        "role": "user",
+        "content": "REPLACED",
+    }
+
+
+def test_message_bad_content() -> None:
+    """Tests that an error is raised on non-string content."""
+    with pytest.raises(TypeError):
+        chat_completion.Message(role="user", content=123)  # type: ignore[arg-type]
+
+
+def test_chat_completion_messages_from_dicts() -> None:
+    """Tests that messages can be provided as dictionaries and round-trip."""
+    chat = chat_completion.ChatCompletion(
+        api_key="123",
+        model="gpt-4",
+        messages=[{"role": "user", "content": "Hi!"}],  # type: ignore[list-item]
+    )
+
+    restored = chat_completion.ChatCompletion.model_validate(chat.model_dump())
+
+    assert chat.messages == [chat_completion.Message(role="user", content="Hi!")]
+    assert restored.messages == chat.messages
+
+
+@pytest.mark.parametrize(
+    "message", [{"role": "bad", "content": "Hi!"}, {"role": "user", "content": 1}]
+)
+def test_chat_completion_messages_bad_dict(message: dict) -> None:
+    """Tests that invalid message dictionaries raise a validation error."""
+    with pytest.raises(pydantic.ValidationError):
+        chat_completion.ChatCompletion(api_key="123", model="gpt-4", messages=[message])
+
+
+def test_chat_completion_max_history_too_small() -> None:
+    """Tests that max_history must leave room besides the system messages."""
+    with pytest.raises(pydantic.ValidationError):
+        chat_completion.ChatCompletion(
+            api_key="123", model="gpt-4", system_prompt="Hello there!", max_history=1
+        )
+
+
+def test_chat_completion_max_history_keeps_last_message() -> None:
+    """Tests that the most recent message survives trimming."""
+    chat = chat_completion.ChatCompletion(
+        api_key="123", model="gpt-4", system_prompt="Hello there!", max_history=2
+    )
+    chat.add_message(role="user", content="1")
+    chat.add_message(role="user", content="2")
+
+    assert chat.messages[-1] == chat_completion.Message(role="user", content="2")
+    assert len(chat.messages) == 2
+
+
+def test_batch_prompt_disk_cache(
+    mocker,
+    response: dict[str, str | int | list[dict[str, str | int]]],
+    tmp_path: pathlib.Path,
+) -> None:
+    """Tests that concurrent conversations can share the disk cache."""
+    acreate = mocker.patch("openai.ChatCompletion.acreate", return_value=response)
+    mocker.patch.dict(caching._caches, {"disk": caching.DiskCache(tmp_path)})
+
+    def _chats() -> list[chat_completion.ChatCompletion]:
+        chats = []
+        for index in range(8):
+            chat = chat_completion.ChatCompletion(
+                api_key="123", model="gpt-4", system_prompt="Hello there!", cache="disk"
+            )
+            chat.add_message(role="user", content=str(index))
+            chats.append(chat)
+        return chats
+
+    asyncio.run(chat_completion.batch_prompt(_chats()))
+    asyncio.run(chat_completion.batch_prompt(_chats()))
+
+    assert acreate.call_count == 8
+
+
+def test_chat_completion_semantic_cache_not_model_data() -> None:
+    """Tests that the semantic cache does not break schema, dumps, or copies."""
+    semantic_cache = caching.SemanticCache(embed=lambda text, _: [1.0])
+    chat = chat_completion.ChatCompletion(
+        api_key="123",
+        model="gpt-4",
+        system_prompt="Hello there!",
+        semantic_cache=semantic_cache,
+    )
+
+    schema = chat_completion.ChatCompletion.model_json_schema()
+    dumped = chat.model_dump_json()
+    copied = chat.model_copy(deep=True)
+
+    assert "semantic_cache" not in schema["properties"]
+    assert "semantic_cache" not in dumped
+    assert copied.semantic_cache is semantic_cache
+
+
+def test_batch_prompt_failure_cancels_others(
+    mocker, response: dict[str, str | int | list[dict[str, str | int]]]
+) -> None:
+    """Tests that a failing conversation cancels the others before returning."""
+    finished = []
+
+    async def _acreate(**kwargs) -> dict:
+        if kwargs["messages"][-1]["content"] == "fail":
+            raise RuntimeError("API error")
+        await asyncio.sleep(0.1)
+        finished.append(kwargs["messages"][-1]["content"])
+        return response
+
+    mocker.patch("openai.ChatCompletion.acreate", side_effect=_acreate)
+    chats = []
+    for content in ("fail", "a", "b"):
+        chat = chat_completion.ChatCompletion(
+            api_key="123", model="gpt-4", system_prompt="Hello there!"
+        )
+        chat.add_message(role="user", content=content)
+        chats.append(chat)
+
+    async def _run() -> None:
+        with pytest.raises(RuntimeError):
+            await chat_completion.batch_prompt(chats)
+        await asyncio.sleep(0.2)
+
+    asyncio.run(_run())
+
+    assert not finished
+    assert all(len(chat.messages) == 2 for chat in chats)